@@ -1,24 +1,62 @@
+from collections import deque
+
 from mesa.discrete_space import CellAgent, FixedAgent
-from .dijkstra import dijkstra, find_closest_target, get_path_length
+from .dijkstra import dijkstra, find_closest_target
 
 
-class RoombaAgent(CellAgent):    
+class RoombaAgent(CellAgent):
     def __init__(
-        self, model, battery=100, cell=None, home_station=None
+        self, model, battery=100, cell=None, home_station=None, index=0
     ):
         super().__init__(model)
+        self.index = index  # slot en los arrays SoA del modelo
         self.battery = battery
         self.cell = cell
         self.home_station = home_station
         self.movements = 0
         self.times_charged = 0
         self.cells_cleaned = 0
-        
 
-        self.current_path = []  #  camino para llegar a target
+
+        self.current_path = deque()  #  camino para llegar a target (popleft es O(1), pop(0) en lista es O(N))
         self.target_dirty_cell = None  # siguiente celda sucia a limpiar
         self.returning_home = False  # var booleana para ver si ya es hora de regrear
 
+    # el estado numérico vive en los arrays SoA del modelo; estas
+    # properties dejan el resto del código igual mientras los reporters
+    # agregan sobre los arrays con numpy
+    @property
+    def battery(self):
+        return int(self.model.roomba_battery[self.index])
+
+    @battery.setter
+    def battery(self, value):
+        self.model.roomba_battery[self.index] = value
+
+    @property
+    def movements(self):
+        return int(self.model.roomba_movements[self.index])
+
+    @movements.setter
+    def movements(self, value):
+        self.model.roomba_movements[self.index] = value
+
+    @property
+    def times_charged(self):
+        return int(self.model.roomba_times_charged[self.index])
+
+    @times_charged.setter
+    def times_charged(self, value):
+        self.model.roomba_times_charged[self.index] = value
+
+    @property
+    def cells_cleaned(self):
+        return int(self.model.roomba_cells_cleaned[self.index])
+
+    @cells_cleaned.setter
+    def cells_cleaned(self, value):
+        self.model.roomba_cells_cleaned[self.index] = value
+
     def step(self):
         # prioridad 1: cargar al máximo si está en estación de carga
         if self.is_on_charging_station() and self.battery < 100:
@@ -48,19 +86,13 @@ class RoombaAgent(CellAgent):
             self.navigate_to_dirty_cell()
     
     def calculate_distance_to_home(self):
-        
-        current_pos = self.cell.coordinate
-        obstacles = self.get_obstacle_positions()
-        
-        distance = get_path_length(
-            current_pos,
-            self.home_station,
-            obstacles,
-            self.model.width,
-            self.model.height
-        )
-        
-        return distance
+
+        c0, c1 = self.cell.coordinate
+
+        # el modelo ya calculó el campo de distancias de cada estación
+        # en el init, así que esto es un lookup en vez de un BFS
+        field = self.model.home_distance_fields[self.home_station]
+        return field.get(c0 * self.model.width + c1, float('inf'))
     
     def return_to_charging_station(self):
         current_pos = self.cell.coordinate
@@ -73,31 +105,32 @@ class RoombaAgent(CellAgent):
                 self.home_station,
                 obstacles,
                 self.model.width,
-                self.model.height
+                self.model.height,
+                cache=self.model.path_cache,
+                scratch=self.model.bfs_scratch,
             )
-            
+
             if path and len(path) > 1:
-                self.current_path = path[1:]  # quitamos la posición en la que ya estamos
+                self.current_path = deque(path[1:])  # quitamos la posición en la que ya estamos
                 self.returning_home = True
-        
+
         # seguimos el camino a la estación de carga
         if self.current_path:
-            next_pos = self.current_path[0]
+            next_pos = self.current_path.popleft()
             next_cell = self.model.grid[next_pos]
-            
+
             self.cell = next_cell
             self.battery -= 1
             self.movements += 1
-            self.current_path.pop(0)
+            self.model.metrics_changed = True
     
     def navigate_to_dirty_cell(self):
         current_pos = self.cell.coordinate
         
-        dirty_positions = [
-            agent.cell.coordinate 
-            for agent in self.model.agents_by_type[DirtyCell]
-        ]
-        
+        # el modelo mantiene el set de coordenadas sucias al día,
+        # no hay que reconstruirlo desde los agentes DirtyCell
+        dirty_positions = self.model.dirty_positions
+
         if not dirty_positions:
             return
         
@@ -109,50 +142,60 @@ class RoombaAgent(CellAgent):
                 dirty_positions,
                 obstacles,
                 self.model.width,
-                self.model.height
+                self.model.height,
+                scratch=self.model.bfs_scratch,
+                field_cache=self.model.target_field_cache,
             )
-            
+
             if result:
                 path, target = result
                 if len(path) > 1:
-                    self.current_path = path[1:]  # quitamos posición actual
+                    self.current_path = deque(path[1:])  # quitamos posición actual
                     self.target_dirty_cell = target
                     self.returning_home = False
-        
+
         # seguimos camino
         if self.current_path:
-            next_pos = self.current_path[0]
+            next_pos = self.current_path.popleft()
             next_cell = self.model.grid[next_pos]
-            
+
             if next_cell:
                 self.cell = next_cell
                 self.battery -= 1
                 self.movements += 1
-                self.current_path.pop(0)
+                self.model.metrics_changed = True
     
     def get_obstacle_positions(self):
-        obstacles = set()
-        for agent in self.model.agents_by_type[Obstacle]:
-            obstacles.add(agent.cell.coordinate)
-        return obstacles
+        # los obstáculos son fijos, el modelo ya tiene todo precalculado:
+        # la máscara numpy si los kernels compilados están disponibles,
+        # si no el frozenset para las versiones puras de python
+        if self.model.obstacle_mask is not None:
+            return self.model.obstacle_mask
+        return self.model.obstacle_positions
 
     def is_on_charging_station(self):
-        return any(isinstance(obj, ChargingStation) for obj in self.cell.agents)
+        # lookup O(1) en el set del modelo en vez de recorrer cell.agents con isinstance
+        return self.cell.coordinate in self.model.charging_station_positions
 
     def is_on_dirty_cell(self):
-        return any(isinstance(obj, DirtyCell) for obj in self.cell.agents)
+        return self.cell.coordinate in self.model.dirty_positions
 
     def charge(self):
         self.battery = min(100, self.battery + 5)
         self.times_charged += 1
+        self.model.metrics_changed = True
 
     def clean(self):
-        dirt = [obj for obj in self.cell.agents if isinstance(obj, DirtyCell)]
+        # sacamos el agente visual directo del dict por coordenada,
+        # sin recorrer cell.agents con isinstance
+        dirt = self.model.dirt_agents.pop(self.cell.coordinate, None)
         if dirt:
-            dirt[0].remove()
+            dirt.remove()
+            self.model.dirty_positions.discard(self.cell.coordinate)
             self.battery -= 1
             self.model.cells_cleaned += 1
             self.cells_cleaned += 1
+            self.model.metrics_changed = True
 
 
 class DirtyCell(FixedAgent):
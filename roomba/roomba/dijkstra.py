@@ -1,119 +1,400 @@
-# importamos priority queue para implementar dijkstra
-import heapq
+# cola FIFO para los BFS (todas las aristas pesan 1)
+from collections import deque
+
+# los kernels compilados con numba son opcionales: si numba no está
+# instalado usamos las versiones puras de python de este archivo
+try:
+    import numpy as np
+    from .dijkstra_numba import bfs_grid, bfs_to_targets
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+# convención de coordenadas: el grid se crea como [height, width], así
+# que una coordenada (c0, c1) cumple c0 < height y c1 < width; el índice
+# empacado es c0 * width + c1 y las máscaras tienen forma (height, width)
+
+# construye la máscara de obstáculos para los kernels compilados
+# regresa None si numba no está disponible (se usa el frozenset normal)
+def build_obstacle_mask(obstacles, width, height):
+    if not NUMBA_AVAILABLE:
+        return None
+
+    mask = np.zeros((height, width), dtype=np.uint8)
+    for c0, c1 in obstacles:
+        mask[c0, c1] = 1
+    return mask
+
+
+# True si obstacles es la máscara numpy en vez del set de coordenadas
+def _is_mask(obstacles):
+    return NUMBA_AVAILABLE and not isinstance(obstacles, (set, frozenset))
+
+
+# buffers de trabajo para los kernels compilados: cada modelo crea los
+# suyos con make_scratch y los pasa en el parámetro scratch, así dos
+# modelos corriendo en el mismo proceso (p.ej. dos sesiones de solara)
+# nunca comparten arrays ni contador; el contador gen hace que los datos
+# de llamadas anteriores cuenten como basura sin tener que limpiar nada
+def make_scratch(width, height):
+    if not NUMBA_AVAILABLE:
+        return None
+
+    size = width * height
+    return {
+        "size": size,
+        "dist": np.empty(size, dtype=np.int32),
+        "prev": np.empty(size, dtype=np.int32),
+        "queue": np.empty(size, dtype=np.int32),
+        "stamp": np.zeros(size, dtype=np.int64),
+        "target_stamp": np.zeros(size, dtype=np.int64),
+        "gen": 0,
+    }
+
+
+# prepara el scratch para una llamada: avanza gen para invalidar los
+# datos anteriores; si el llamador no trae buffers (o son de otro
+# tamaño) se crean unos desechables para esta llamada
+def _checkout_scratch(scratch, width, height):
+    if scratch is None or scratch["size"] != width * height:
+        scratch = make_scratch(width, height)
+    scratch["gen"] += 1
+    return scratch
+
+
+# tope del cache de caminos de un modelo; si se pasa, se limpia entero
+_PATH_CACHE_MAX = 4096
+
 
 # start - coordenadas de inicio, goal - coordenadas de nodo objetivo
 # obstacles - set de coordenadas de obstáculos, width y height son ints para no salirnos del grid
-def dijkstra(start, goal, obstacles, width, height):
+# cache - dict de caminos PROPIO del modelo que llama: como el mapa de un
+# modelo no cambia durante la corrida, (start, goal) basta como llave, y
+# al ser del modelo muere con él (una llave global por identidad de la
+# máscara serviría caminos viejos cuando otra máscara reusa la dirección)
+def dijkstra(start, goal, obstacles, width, height, cache=None, scratch=None):
 
     # condición de parada
     if start == goal:
         return [start]
-    
-    # priority queue
-    pq = [(0, start)]
-    
-    # lista que guarda las distancias más cortas desde posición actual a cada nodo (coordenada)
-    distances = {start: 0}
-    
-    # lista que guarda la úlitma coordenada antes de llegar a un nodo 
+
+    if cache is None:
+        return _dijkstra_search(start, goal, obstacles, width, height, scratch)
+
+    key = (start, goal)
+    if key in cache:
+        return cache[key]
+
+    path = _dijkstra_search(start, goal, obstacles, width, height, scratch)
+
+    if len(cache) >= _PATH_CACHE_MAX:
+        cache.clear()
+    cache[key] = path
+
+    return path
+
+
+def _dijkstra_search(start, goal, obstacles, width, height, scratch=None):
+
+    # camino rápido: kernel BFS compilado sobre la máscara de obstáculos
+    if _is_mask(obstacles):
+        s = _checkout_scratch(scratch, width, height)
+        goal_dist = bfs_grid(
+            obstacles, start[0], start[1], goal[0], goal[1], width, height,
+            s["dist"], s["prev"], s["queue"], s["stamp"], s["gen"],
+        )
+        if goal_dist < 0:
+            return None  # no hubo camino para llegar al goal
+        return reconstruct_path(s["prev"], start, goal, width, length=int(goal_dist))
+
+    # trabajamos con índices empacados (c0 * width + c1): comparar y
+    # hashear un int es más barato que una tupla, y no se crean objetos nuevos
+    start_idx = start[0] * width + start[1]
+    goal_idx = goal[0] * width + goal[1]
+
+    # como todas las aristas pesan 1, la priority queue sobra: una cola
+    # FIFO ya saca los nodos en orden de distancia (la "bucket queue"
+    # de pesos uniformes es exactamente eso), sin el log del heap
+    queue = deque([start_idx])
+
+    # guarda el último nodo antes de llegar a un nodo, y de paso
+    # funciona como registro de visitados
     previous = {}
-    
-    # guarda nodos visitados para no regresar
-    visited = set()
-    
-
-    while pq:
-        current_dist, current_pos = heapq.heappop(pq)
-        
-        # ignoramos si ya lo visitamos
-        if current_pos in visited:
-            continue
-        
-        visited.add(current_pos)
-        
+
+    visited = {start_idx}
+
+    while queue:
+        current = queue.popleft()
+
         # si llegamos a goal, custruimos el camino usando el hash map (previous) con los pasos
-        if current_pos == goal:
-            return reconstruct_path(previous, start, goal)
-        
+        if current == goal_idx:
+            return reconstruct_path(previous, start, goal, width)
+
         # exploramos los vecinos
-        x, y = current_pos
+        c0 = current // width
+        c1 = current % width
         neighbors = [
-            (x + 1, y),
-            (x - 1, y),
-            (x, y + 1),
-            (x, y - 1),
+            (c0 + 1, c1),
+            (c0 - 1, c1),
+            (c0, c1 + 1),
+            (c0, c1 - 1),
         ]
-        
-        for neighbor in neighbors:
-            nx, ny = neighbor
-            
-            if not (0 <= nx < width and 0 <= ny < height):
+
+        for n0, n1 in neighbors:
+
+            if not (0 <= n0 < height and 0 <= n1 < width):
                 continue  # fuera del grid
-            
-            if neighbor in obstacles:
+
+            if (n0, n1) in obstacles:
                 continue  # el vecino está bloqueado
-            
+
+            neighbor = n0 * width + n1
             if neighbor in visited:
                 continue  # ya lo procesamos
-            
-            new_dist = current_dist + 1
-            
-            # si encontramos un camino más corto para llegar a un nodo, o si no habíamos guardado un camino para llegar a ese nodo, lo guardamos
-            if neighbor not in distances or new_dist < distances[neighbor]:
-                distances[neighbor] = new_dist
-                previous[neighbor] = current_pos
-                heapq.heappush(pq, (new_dist, neighbor))
-    
+
+            visited.add(neighbor)
+            previous[neighbor] = current
+            queue.append(neighbor)
+
     # no hubo camino para llegar al goal
     return None
 
-# previous - hash map con los pasos para llegar, start y goal - coordenadas de inicio y fin
-def reconstruct_path(previous, start, goal):
+# previous - hash map o array plano indexado por índice empacado (c0 * width + c1)
+# start y goal - coordenadas (c0, c1) de inicio y fin
+# length - distancia de start a goal si el llamador ya la conoce; con ella
+# la lista se aloja de un jalón y se llena de atrás hacia adelante, sin
+# appends ni list.reverse
+def reconstruct_path(previous, start, goal, width, length=None):
+    start_idx = start[0] * width + start[1]
+    current = goal[0] * width + goal[1]
+
+    if length is not None:
+        path = [start] * (length + 1)
+
+        for i in range(length, 0, -1):
+            path[i] = (current // width, current % width)
+            current = previous[current]
+
+        return path
+
+    # sin la distancia conocida: construimos de goal a start y volteamos
     path = []
 
-    # la lista camino tiene los pasos de goal a start
-    current = goal
-    
-    while current != start:
-        path.append(current)
+    while current != start_idx:
+        path.append((current // width, current % width))
         current = previous[current]
-    
+
     path.append(start)
 
     # invertimos la lista para tener el orden de start a goal
     path.reverse()
-    
+
     return path
 
-# esta función encuentra la celda sucia más cerca 
+# BFS completo desde source que regresa la distancia a TODAS las celdas
+# alcanzables, como dict índice empacado -> pasos; como el grid no es
+# dirigido la distancia sirve en ambos sentidos, así que se puede
+# precalcular una vez por estación y consultar con un lookup
+def build_distance_field(source, obstacles, width, height):
+    source_idx = source[0] * width + source[1]
+
+    distances = {source_idx: 0}
+    queue = deque([source_idx])
+
+    while queue:
+        current = queue.popleft()
+        current_dist = distances[current]
+
+        c0 = current // width
+        c1 = current % width
+        neighbors = [
+            (c0 + 1, c1),
+            (c0 - 1, c1),
+            (c0, c1 + 1),
+            (c0, c1 - 1),
+        ]
+
+        for n0, n1 in neighbors:
+
+            if not (0 <= n0 < height and 0 <= n1 < width):
+                continue  # fuera del grid
+
+            if (n0, n1) in obstacles:
+                continue  # el vecino está bloqueado
+
+            neighbor = n0 * width + n1
+            if neighbor in distances:
+                continue  # ya lo procesamos
+
+            distances[neighbor] = current_dist + 1
+            queue.append(neighbor)
+
+    return distances
+
+
+# BFS multi-fuente sembrado desde TODOS los targets a la vez: una sola
+# pasada del grid construye el "diagrama de voronoi" de cercanía, o sea
+# para cada celda el siguiente paso hacia su target más cercano
+# regresa un dict índice empacado -> índice del siguiente paso
+# (los targets se apuntan a sí mismos)
+def build_target_field(targets, obstacles, width, height):
+    next_step = {}
+    queue = deque()
+
+    for t0, t1 in targets:
+        idx = t0 * width + t1
+        next_step[idx] = idx
+        queue.append(idx)
+
+    while queue:
+        current = queue.popleft()
+
+        c0 = current // width
+        c1 = current % width
+        neighbors = [
+            (c0 + 1, c1),
+            (c0 - 1, c1),
+            (c0, c1 + 1),
+            (c0, c1 - 1),
+        ]
+
+        for n0, n1 in neighbors:
+
+            if not (0 <= n0 < height and 0 <= n1 < width):
+                continue  # fuera del grid
+
+            if (n0, n1) in obstacles:
+                continue  # el vecino está bloqueado
+
+            neighbor = n0 * width + n1
+            if neighbor in next_step:
+                continue  # ya tiene asignado su target más cercano
+
+            # como el BFS expande desde los targets, dar un paso hacia
+            # current siempre acerca al target más cercano
+            next_step[neighbor] = current
+            queue.append(neighbor)
+
+    return next_step
+
+
+# esta función encuentra la celda sucia más cerca
 # start - coordenadas de nodo inicial, targets y obstacles - sets de coordenadas
-def find_closest_target(start, targets, obstacles, width, height):
+# field_cache - dict PROPIO del modelo que llama (igual que scratch y el
+# cache de caminos): guarda el último campo de targets para que todos
+# los agentes del modelo compartan un solo BFS mientras el mundo no
+# cambie, sin que dos modelos en el mismo proceso se invaliden entre sí
+def find_closest_target(start, targets, obstacles, width, height, scratch=None, field_cache=None):
 
     if not targets:
         return None
-    
-    # variables para guardar camino más corto y su distancia 
-    shortest_path = None
-    closest_target = None
-
-    shortest_distance = float('inf')
-    
-    # usamos dijsktra para encontrar el target más cercano
-    for target in targets:
-        path = dijkstra(start, target, obstacles, width, height)
-        if path and len(path) < shortest_distance:
-            shortest_distance = len(path)
-            shortest_path = path
-            closest_target = target
-    
-    if shortest_path:
-        return (shortest_path, closest_target)
-    
-    return None
 
+    targets = frozenset(targets)
+
+    if start in targets:
+        return ([start], start)
+
+    # camino rápido: kernel BFS compilado que para en el primer target
+    if _is_mask(obstacles):
+        s = _checkout_scratch(scratch, width, height)
+
+        # marcamos los targets con el gen de esta llamada; las marcas
+        # viejas expiran solas cuando gen avanza
+        target_stamp = s["target_stamp"]
+        for t0, t1 in targets:
+            target_stamp[t0 * width + t1] = s["gen"]
+
+        found = bfs_to_targets(
+            obstacles, start[0], start[1], target_stamp, width, height,
+            s["dist"], s["prev"], s["queue"], s["stamp"], s["gen"],
+        )
+        if found < 0:
+            return None  # ningún target es alcanzable
+
+        closest_target = (found // width, found % width)
+        path = reconstruct_path(
+            s["prev"], start, closest_target, width, length=int(s["dist"][found])
+        )
+        return (path, closest_target)
+
+    # camino puro de python: BFS inverso desde todos los targets, cacheado
+    # mientras el estado del mundo no cambie
+    if field_cache is not None:
+        key = (targets, obstacles, width, height)
+        if field_cache.get("key") != key:
+            field_cache["key"] = key
+            field_cache["field"] = build_target_field(targets, obstacles, width, height)
+        next_step = field_cache["field"]
+    else:
+        next_step = build_target_field(targets, obstacles, width, height)
+
+    current = start[0] * width + start[1]
+    if current not in next_step:
+        return None  # ningún target es alcanzable
+
+    # seguimos el campo hasta el target; el camino sale ya en orden
+    # de start a target, sin necesidad de invertirlo
+    path = [start]
+    while next_step[current] != current:
+        current = next_step[current]
+        path.append((current // width, current % width))
+
+    return (path, path[-1])
+
+
+def get_path_length(start, goal, obstacles, width, height, scratch=None):
+    # BFS con salida temprana: solo necesitamos la distancia, no el camino
+    if start == goal:
+        return 0
+
+    # camino rápido: kernel BFS compilado
+    if _is_mask(obstacles):
+        s = _checkout_scratch(scratch, width, height)
+        goal_dist = bfs_grid(
+            obstacles, start[0], start[1], goal[0], goal[1], width, height,
+            s["dist"], s["prev"], s["queue"], s["stamp"], s["gen"],
+        )
+        if goal_dist < 0:
+            return float('inf')
+        return int(goal_dist)
+
+    # índices empacados, igual que en dijkstra
+    start_idx = start[0] * width + start[1]
+    goal_idx = goal[0] * width + goal[1]
+
+    queue = deque([(start_idx, 0)])
+    visited = {start_idx}
+
+    while queue:
+        current, current_dist = queue.popleft()
+
+        c0 = current // width
+        c1 = current % width
+        neighbors = [
+            (c0 + 1, c1),
+            (c0 - 1, c1),
+            (c0, c1 + 1),
+            (c0, c1 - 1),
+        ]
+
+        for n0, n1 in neighbors:
+
+            if not (0 <= n0 < height and 0 <= n1 < width):
+                continue  # fuera del grid
+
+            if (n0, n1) in obstacles:
+                continue  # el vecino está bloqueado
+
+            neighbor = n0 * width + n1
+            if neighbor in visited:
+                continue  # ya lo procesamos
+
+            if neighbor == goal_idx:
+                return current_dist + 1
+
+            visited.add(neighbor)
+            queue.append((neighbor, current_dist + 1))
 
-def get_path_length(start, goal, obstacles, width, height):
-    path = dijkstra(start, goal, obstacles, width, height)
-    if path:
-        return len(path) - 1  # restamos 1 porque el camino incluye la posición inicial
     return float('inf') # regresamos infinito si no hay camino
@@ -0,0 +1,125 @@
+# kernels de búsqueda compilados con numba
+# trabajan sobre arrays planos int32 en lugar de dicts/sets de tuplas,
+# así el loop interno corre a velocidad de C sin el overhead del intérprete
+#
+# convención de coordenadas (igual que dijkstra.py): una coordenada
+# (c0, c1) del grid cumple c0 < height y c1 < width, el índice empacado
+# es c0 * width + c1 y las máscaras tienen forma (height, width)
+#
+# los arrays dist/prev/queue/stamp los presta el llamador y se reutilizan
+# entre llamadas: en vez de limpiar los buffers, una celda cuenta como
+# visitada en ESTA llamada solo si stamp[idx] == gen, así que basta con
+# subir gen para "borrar" todo en O(1)
+import numpy as np
+from numba import njit
+
+
+# BFS desde (s0, s1) hasta (g0, g1) sobre el grid aplanado
+# obstacle_mask - array uint8 de forma (height, width), 1 = obstáculo
+# regresa la distancia al goal, o -1 si no es alcanzable; el camino
+# queda en prev (válido solo donde stamp == gen)
+@njit(cache=True)
+def bfs_grid(obstacle_mask, s0, s1, g0, g1, width, height, dist, prev, queue, stamp, gen):
+    start = s0 * width + s1
+    goal = g0 * width + g1
+
+    dist[start] = 0
+    prev[start] = -1
+    stamp[start] = gen
+
+    queue[0] = start
+    head = 0
+    tail = 1
+
+    while head < tail:
+        current = queue[head]
+        head += 1
+
+        if current == goal:
+            return dist[current]
+
+        c0 = current // width
+        c1 = current % width
+
+        for k in range(4):
+            if k == 0:
+                n0, n1 = c0 + 1, c1
+            elif k == 1:
+                n0, n1 = c0 - 1, c1
+            elif k == 2:
+                n0, n1 = c0, c1 + 1
+            else:
+                n0, n1 = c0, c1 - 1
+
+            if n0 < 0 or n0 >= height or n1 < 0 or n1 >= width:
+                continue  # fuera del grid
+
+            if obstacle_mask[n0, n1] == 1:
+                continue  # el vecino está bloqueado
+
+            neighbor = n0 * width + n1
+            if stamp[neighbor] == gen:
+                continue  # ya lo procesamos en esta llamada
+
+            stamp[neighbor] = gen
+            dist[neighbor] = dist[current] + 1
+            prev[neighbor] = current
+            queue[tail] = neighbor
+            tail += 1
+
+    return -1
+
+
+# BFS desde (s0, s1) que se detiene en el primer target que sale de la cola
+# target_stamp - array plano donde target_stamp[idx] == gen marca un target
+# regresa el índice empacado del target encontrado, o -1
+@njit(cache=True)
+def bfs_to_targets(obstacle_mask, s0, s1, target_stamp, width, height, dist, prev, queue, stamp, gen):
+    start = s0 * width + s1
+
+    dist[start] = 0
+    prev[start] = -1
+    stamp[start] = gen
+
+    queue[0] = start
+    head = 0
+    tail = 1
+
+    while head < tail:
+        current = queue[head]
+        head += 1
+
+        # el primer target que sacamos de la cola es el más cercano
+        if target_stamp[current] == gen:
+            return current
+
+        c0 = current // width
+        c1 = current % width
+
+        for k in range(4):
+            if k == 0:
+                n0, n1 = c0 + 1, c1
+            elif k == 1:
+                n0, n1 = c0 - 1, c1
+            elif k == 2:
+                n0, n1 = c0, c1 + 1
+            else:
+                n0, n1 = c0, c1 - 1
+
+            if n0 < 0 or n0 >= height or n1 < 0 or n1 >= width:
+                continue  # fuera del grid
+
+            if obstacle_mask[n0, n1] == 1:
+                continue  # el vecino está bloqueado
+
+            neighbor = n0 * width + n1
+            if stamp[neighbor] == gen:
+                continue  # ya lo procesamos en esta llamada
+
+            stamp[neighbor] = gen
+            dist[neighbor] = dist[current] + 1
+            prev[neighbor] = current
+            queue[tail] = neighbor
+            tail += 1
+
+    return -1
@@ -1,9 +1,11 @@
 import math
 
+import numpy as np
 from mesa import Model
 from mesa.datacollection import DataCollector
 from mesa.discrete_space import OrthogonalVonNeumannGrid
 from .agents import ChargingStation, DirtyCell, Obstacle, RoombaAgent
+from .dijkstra import build_distance_field, build_obstacle_mask, make_scratch
 from mesa.experimental.devs import ABMSimulator
 
 
@@ -18,6 +20,7 @@ class RoombaCleaning(Model):
         obstacle_percentage=10,
         max_time=1000,
         simulation_type="Sim 1",
+        collect_every=1,
         seed=None,
         simulator: ABMSimulator = None,
     ):
@@ -34,6 +37,9 @@ class RoombaCleaning(Model):
         self.obstacle_percentage = obstacle_percentage
         self.max_time = max_time
         self.simulation_type = simulation_type
+        # cada cuántos pasos coleccionar datos; 1 = cada paso (como la
+        # visualización espera), más alto para corridas batch sin UI
+        self.collect_every = collect_every
         self.cells_cleaned = 0
         self.initial_dirt_count = 0
 
@@ -45,85 +51,168 @@ class RoombaCleaning(Model):
             random=self.random,
         )
 
-        # Set up data collection
-        model_reporters = {
-            "Roombas": lambda m: len(m.agents_by_type[RoombaAgent]),
-            "Dirty Cells": lambda m: len(m.agents_by_type[DirtyCell]),
-            "Average Battery": lambda m: sum(a.battery for a in m.agents_by_type[RoombaAgent]) / max(len(m.agents_by_type[RoombaAgent]), 1),
-            "Total Movements": lambda m: sum(a.movements for a in m.agents_by_type[RoombaAgent]),
-            "Cells Cleaned": lambda m: m.cells_cleaned,
-            "Times Charged": lambda m: sum(a.times_charged for a in m.agents_by_type[RoombaAgent]),
-        }
-
-        self.datacollector = DataCollector(model_reporters)
-
         # número de obstáculos
         num_obstacles = int((width * height) * (obstacle_percentage / 100))
         available_cells = list(self.grid.all_cells.cells)
         
-        obstacle_cells = self.random.sample(available_cells, min(num_obstacles, len(available_cells)))
+        obstacle_cells = self.sample_cells(available_cells, min(num_obstacles, len(available_cells)))
         for cell in obstacle_cells:
             Obstacle(self, cell)
-            available_cells.remove(cell)
+
+        # quitamos las celdas ocupadas de un jalón: list.remove dentro del
+        # loop es O(N) por celda, o sea cuadrático en el tamaño del grid
+        taken = set(obstacle_cells)
+        available_cells = [cell for cell in available_cells if cell not in taken]
+
+        # los obstáculos nunca se mueven, así que guardamos sus coordenadas
+        # una sola vez en lugar de reconstruir el set en cada paso de cada agente
+        self.obstacle_positions = frozenset(cell.coordinate for cell in obstacle_cells)
+
+        # máscara numpy para los kernels BFS compilados (None si no hay numba)
+        self.obstacle_mask = build_obstacle_mask(self.obstacle_positions, width, height)
+
+        # buffers de trabajo propios de ESTE modelo para los kernels;
+        # si fueran globales, dos modelos en el mismo proceso se
+        # corromperían las búsquedas entre sí
+        self.bfs_scratch = make_scratch(width, height)
+
+        # cache de caminos (start, goal) -> camino, también propio del
+        # modelo: el mapa es fijo durante la corrida y el cache muere
+        # junto con el modelo al resetear la simulación
+        self.path_cache = {}
+
+        # cache del campo de targets (ruta pura de python): un solo BFS
+        # compartido por todos los agentes mientras la mugre no cambie
+        self.target_field_cache = {}
+
+        # estado numérico de los roombas en arrays SoA (un slot por
+        # agente): los reporters agregan con numpy sobre estos arrays en
+        # vez de iterar los objetos atributo por atributo
+        n_roombas = 1 if simulation_type == "Sim 1" else num_agents
+        self.roomba_battery = np.zeros(n_roombas, dtype=np.int64)
+        self.roomba_movements = np.zeros(n_roombas, dtype=np.int64)
+        self.roomba_times_charged = np.zeros(n_roombas, dtype=np.int64)
+        self.roomba_cells_cleaned = np.zeros(n_roombas, dtype=np.int64)
 
         # Crear roombas y estaciones de cargas según Sim 1 o Sim 2
         if simulation_type == "Sim 1":
             # sim 1 para la simulación con 1 sólo agente que empieza en (0, 0)
             start_cell = self.grid[(0, 0)]
             ChargingStation(self, start_cell)
+            self.charging_station_positions = frozenset([(0, 0)])
             RoombaAgent.create_agents(
                 self,
                 1,
                 battery=100,
                 cell=[start_cell],
                 home_station=[(0, 0)],
+                index=[0],
             )
         else:  # Sim 2
             # muchos agentes en posiciones random
-            agent_cells = self.random.sample(available_cells, min(num_agents, len(available_cells)))
+            agent_cells = self.sample_cells(available_cells, min(num_agents, len(available_cells)))
             for cell in agent_cells:
                 ChargingStation(self, cell)
-                available_cells.remove(cell)
-            
+
+            # misma idea que con los obstáculos: una sola pasada en vez de removes
+            taken = set(agent_cells)
+            available_cells = [cell for cell in available_cells if cell not in taken]
+
             home_stations = [cell.coordinate for cell in agent_cells]
+            self.charging_station_positions = frozenset(home_stations)
             RoombaAgent.create_agents(
                 self,
                 num_agents,
                 battery=100,
                 cell=agent_cells,
                 home_station=home_stations,
+                index=list(range(num_agents)),
             )
 
+        # campo de distancias a cada estación, calculado una sola vez:
+        # un BFS por estación y después consultar la distancia a casa
+        # desde cualquier celda es un simple lookup
+        self.home_distance_fields = {
+            station: build_distance_field(station, self.obstacle_positions, width, height)
+            for station in self.charging_station_positions
+        }
+
         # crear celdas sucias
         num_dirt = int(len(available_cells) * (dirt_percentage / 100))
-        dirt_cells = self.random.sample(available_cells, num_dirt)
+        dirt_cells = self.sample_cells(available_cells, num_dirt)
+
+        # los agentes DirtyCell solo existen para que la visualización los
+        # dibuje; toda la lógica de la simulación trabaja con coordenadas,
+        # y este dict permite quitar el agente correcto en O(1) al limpiar
+        self.dirt_agents = {}
         for cell in dirt_cells:
-            DirtyCell(self, cell)
-        
+            self.dirt_agents[cell.coordinate] = DirtyCell(self, cell)
+
+        # set con las coordenadas sucias, se mantiene al día cuando un
+        # roomba limpia; así los agentes no reconstruyen la lista cada paso
+        self.dirty_positions = set(cell.coordinate for cell in dirt_cells)
+
         self.initial_dirt_count = num_dirt
 
+        # guardamos el AgentSet de roombas una sola vez; buscarlo en
+        # agents_by_type dentro de cada reporter en cada paso es un
+        # lookup por hash de tipo que no aporta nada
+        self.roombas = self.agents_by_type[RoombaAgent]
+
+        # Set up data collection
+        model_reporters = {
+            "Roombas": lambda m: len(m.roombas),
+            "Dirty Cells": lambda m: len(m.dirty_positions),
+            "Average Battery": lambda m: float(m.roomba_battery.mean()),
+            "Total Movements": lambda m: int(m.roomba_movements.sum()),
+            "Cells Cleaned": lambda m: m.cells_cleaned,
+            "Times Charged": lambda m: int(m.roomba_times_charged.sum()),
+        }
+
+        self.datacollector = DataCollector(model_reporters)
+
         # Collect initial data
         self.running = True
+        self.metrics_changed = False
         self.datacollector.collect(self)
         self.stats_printed = False
 
-    def step(self):
-        # activar roombas
-        self.agents_by_type[RoombaAgent].shuffle_do("step")
+    # muestreo sin reemplazo con el generador de numpy: elige índices con
+    # un array en vez de que random.sample recorra la lista de objetos
+    def sample_cells(self, cells, k):
+        if k <= 0:
+            return []
+        idxs = self.rng.choice(len(cells), size=k, replace=False)
+        return [cells[i] for i in idxs]
 
-        # coleccionar datos
-        self.datacollector.collect(self)
+    def step(self):
+        # activar roombas (usamos el AgentSet tipado ya guardado)
+        self.roombas.shuffle_do("step")
+
+        # coleccionar datos: la bandera es pegajosa — los agentes la
+        # prenden al moverse/cargar/limpiar y solo una colecta la apaga,
+        # así un paso de muestreo publica todo lo ocurrido desde la
+        # colecta anterior y nada se pierde entre muestras
+        # (mesa lleva self.steps solo)
+        if self.metrics_changed and self.steps % self.collect_every == 0:
+            self.datacollector.collect(self)
+            self.metrics_changed = False
 
         # checar si ya pasó tiempo máximo
         if self.simulator.time >= self.max_time:
             self.running = False
         
-        # checar si todo está limpio
-        if len(self.agents_by_type[DirtyCell]) == 0:
+        # checar si todo está limpio (el set se mantiene al día al limpiar)
+        if not self.dirty_positions:
             self.running = False
         
         # imprimir estadísticas solo una vez al final
         if not self.running and not self.stats_printed:
+            # foto final: si la corrida terminó entre muestras, publicamos
+            # el estado terminal pendiente para que la serie lo registre
+            if self.metrics_changed:
+                self.datacollector.collect(self)
+                self.metrics_changed = False
             self.print_individual_stats()
             self.stats_printed = True
     
@@ -133,16 +222,16 @@ class RoombaCleaning(Model):
         # Métricas globales
         print("\n--- Métricas Globales ---")
         print(f"Tiempo total: {self.simulator.time} pasos")
-        print(f"Roombas: {len(self.agents_by_type[RoombaAgent])}")
+        print(f"Roombas: {len(self.roombas)}")
         print(f"Celdas sucias iniciales: {self.initial_dirt_count}")
         print(f"Celdas limpiadas: {self.cells_cleaned}")
-        print(f"Celdas sucias restantes: {len(self.agents_by_type[DirtyCell])}")
+        print(f"Celdas sucias restantes: {len(self.dirty_positions)}")
         print(f"Porcentaje limpiado: {(self.cells_cleaned / self.initial_dirt_count * 100):.1f}%")
         
-        roombas = self.agents_by_type[RoombaAgent]
-        total_movements = sum(a.movements for a in roombas)
-        total_charges = sum(a.times_charged for a in roombas)
-        avg_battery = sum(a.battery for a in roombas) / max(len(roombas), 1)
+        roombas = self.roombas
+        total_movements = int(self.roomba_movements.sum())
+        total_charges = int(self.roomba_times_charged.sum())
+        avg_battery = float(self.roomba_battery.mean())
         
         print(f"Total movimientos: {total_movements}")
         print(f"Total cargas: {total_charges}")